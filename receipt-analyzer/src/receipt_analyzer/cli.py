@@ -1,5 +1,7 @@
 import argparse
-from .main import run
+from pathlib import Path
+from .config import load_config
+from .main import run, watch, serve, warm_caches, cache_stats, clear_caches
 from .logger import get_logger
 
 logger = get_logger(__name__)
@@ -7,9 +9,36 @@ logger = get_logger(__name__)
 def main():
     parser = argparse.ArgumentParser(prog="receipt-analyzer", description="Analyze receipts and export to Excel")
     parser.add_argument("--config", "-c", default="config.yaml", help="Path to config file")
+    sub = parser.add_subparsers(dest="command")
+    parser.set_defaults(command="run", full=False)
+    run_cmd = sub.add_parser("run", help="Process new or changed receipts and export results (default)")
+    run_cmd.add_argument("--full", action="store_true", help="Ignore the manifest and reprocess every receipt")
+    sub.add_parser("watch", help="Keep running and process receipts as they arrive in receipts_dir")
+    serve_cmd = sub.add_parser("serve", help="Run the HTTP extraction service")
+    serve_cmd.add_argument("--host", default=None, help="Bind address (default: serve_host from config)")
+    serve_cmd.add_argument("--port", type=int, default=None, help="Port (default: serve_port from config)")
+    serve_cmd.add_argument("--stub-llm", action="store_true", help="Use rule-based extraction only, no Ollama")
+    cache = sub.add_parser("cache", help="Inspect, warm or invalidate the OCR/LLM caches")
+    cache.add_argument("action", choices=["stats", "warm", "clear"])
+    cache.add_argument("--kind", choices=["ocr", "llm", "all"], default="all", help="Which cache to act on")
     args = parser.parse_args()
     try:
-        run()
+        cfg = load_config(Path(args.config))
+        if args.command == "watch":
+            watch(cfg)
+        elif args.command == "serve":
+            serve(cfg, host=args.host, port=args.port, stub_llm=args.stub_llm)
+        elif args.command == "cache":
+            if args.action == "warm":
+                warm_caches(cfg)
+            elif args.action == "clear":
+                clear_caches(cfg, args.kind)
+            else:
+                for name, stats in cache_stats(cfg, args.kind).items():
+                    print(f"{name}: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB, "
+                          f"{stats['expired_purged']} expired purged ({stats['path']})")
+        else:
+            run(cfg, full=args.full)
     except Exception as exc:
         logger.exception("Application failed: %s", exc)
         raise SystemExit(1)
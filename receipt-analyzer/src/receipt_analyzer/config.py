@@ -6,12 +6,43 @@ from typing import Optional
 class Settings(BaseSettings):
     receipts_dir: Path = Field(default=Path("../sample_receipts"))
     output_excel: Path = Field(default=Path("receipts_output.xlsx"))
+    manifest_path: Optional[Path] = Field(default=None)   # defaults to <output>.manifest.sqlite
+    export_flush_every: int = Field(default=50)           # rows between fsyncs of the streamed output
+    parquet_partition_by: Optional[str] = Field(default=None)  # None | month | vendor (.parquet output only)
+    parquet_row_group_size: int = Field(default=10000)
     ollama_model: str = Field(default="llama3.2:3b")
     ollama_cmd: str = Field(default="ollama")
     ollama_timeout: int = Field(default=300)
+    ollama_host: Optional[str] = Field(default=None)   # None → OLLAMA_HOST or http://localhost:11434
+    ollama_keep_alive: str = Field(default="10m")      # keep the model loaded between bursts
     max_workers: int = Field(default=4)
+    ocr_workers: Optional[int] = Field(default=None)   # process pool size, defaults to max_workers
+    llm_cache_enabled: bool = Field(default=True)
+    llm_cache_path: Path = Field(default=Path(".cache/llm_cache.sqlite"))
+    llm_cache_max_mb: int = Field(default=256)
+    llm_cache_ttl_days: Optional[float] = Field(default=30)
+    fast_path_enabled: bool = Field(default=True)
+    fast_path_threshold: float = Field(default=0.9)    # rule-based confidence needed to skip the LLM
+    llm_workers: Optional[int] = Field(default=None)   # concurrent Ollama requests, defaults to max_workers
+    llm_batch_size: int = Field(default=1)             # receipts packed into one prompt; 1 disables batching
+    llm_batch_wait_ms: int = Field(default=50)         # how long a partial batch waits for more receipts
+    queue_size: int = Field(default=16)                # OCR results allowed to wait for the LLM stage
     tesseract_cmd: Optional[str] = Field(default=None)
+    ocr_engines: int = Field(default=1)               # warm Tesseract engines per OCR worker process
     log_level: str = Field(default="INFO")
+    serve_host: str = Field(default="127.0.0.1")
+    serve_port: int = Field(default=8080)
+    serve_max_pending: int = Field(default=64)        # requests in flight before /extract answers 503
+    serve_max_upload_mb: int = Field(default=20)
+    watch_settle_seconds: float = Field(default=1.0)   # size/mtime must be stable this long before OCR
+    watch_poll_seconds: float = Field(default=1.0)     # directory poll interval when inotify is unavailable
+    watch_export_seconds: float = Field(default=2.0)   # quiet period before the output is refreshed
+    preprocess_profile: str = Field(default="auto")   # fast | balanced | quality | auto
+    ocr_min_confidence: float = Field(default=60.0)   # auto mode escalates to "quality" below this
+    ocr_cache_enabled: bool = Field(default=True)
+    ocr_cache_path: Path = Field(default=Path(".cache/ocr_cache.sqlite"))
+    ocr_cache_max_mb: int = Field(default=512)
+    ocr_cache_clear: bool = Field(default=False)
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,146 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Protocol, Tuple
+import numpy as np
+import pytesseract
+from .logger import get_logger
+
+try:
+    import tesserocr
+except ImportError:  # optional: falls back to one tesseract subprocess per image
+    tesserocr = None
+
+logger = get_logger(__name__)
+
+TESSERACT_LANG = "eng"
+TESSERACT_OEM = 1
+TESSERACT_PSM = 6
+TESSERACT_CONFIG = f"--oem {TESSERACT_OEM} --psm {TESSERACT_PSM} -l {TESSERACT_LANG}"
+
+
+class OcrEngine(Protocol):
+    def recognize(self, img: np.ndarray) -> Tuple[str, float]: ...
+    def close(self) -> None: ...
+
+
+class TesserocrEngine:
+    """Long-lived Tesseract API handle; the LSTM model is loaded once in __init__."""
+
+    def __init__(self):
+        self._api = tesserocr.PyTessBaseAPI(
+            lang=TESSERACT_LANG,
+            oem=tesserocr.OEM(TESSERACT_OEM),
+            psm=tesserocr.PSM(TESSERACT_PSM),
+        )
+
+    def recognize(self, img: np.ndarray) -> Tuple[str, float]:
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        h, w = img.shape[:2]
+        # 8-bit grayscale straight from the numpy buffer: no PIL round-trip, no temp files
+        self._api.SetImageBytes(img.tobytes(), w, h, 1, w)
+        return self._api.GetUTF8Text().strip(), float(self._api.MeanTextConf())
+
+    def close(self) -> None:
+        self._api.End()
+
+
+class SubprocessEngine:
+    """pytesseract fallback. Still forks tesseract per call, but configures the binary only once."""
+
+    def __init__(self, tesseract_cmd: Optional[str] = None):
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    def recognize(self, img: np.ndarray) -> Tuple[str, float]:
+        data = pytesseract.image_to_data(img, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+        lines = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not word.strip():
+                continue
+            confidences.append(conf)
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return text, confidence
+
+    def close(self) -> None:
+        pass
+
+
+def default_engine_factory(tesseract_cmd: Optional[str] = None) -> Callable[[], OcrEngine]:
+    if tesserocr is not None:
+        return TesserocrEngine
+    logger.warning("tesserocr is not installed; falling back to one tesseract subprocess per image")
+    return lambda: SubprocessEngine(tesseract_cmd)
+
+
+class EnginePool:
+    """Fixed-size pool of OCR engines, created lazily and reused across calls."""
+
+    def __init__(self, size: int, factory: Callable[[], OcrEngine]):
+        self.size = max(1, size)
+        self._factory = factory
+        self._idle: "queue.Queue[OcrEngine]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        with self._lock:
+            while self._created < self.size:
+                self._idle.put(self._factory())
+                self._created += 1
+
+    @contextmanager
+    def engine(self) -> Iterator[OcrEngine]:
+        try:
+            eng = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            eng = self._factory() if create else self._idle.get()
+        try:
+            yield eng
+        finally:
+            self._idle.put(eng)
+
+    def recognize(self, img: np.ndarray) -> Tuple[str, float]:
+        with self.engine() as eng:
+            return eng.recognize(img)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+_pool: Optional[EnginePool] = None
+_pool_lock = threading.Lock()
+
+
+def configure_engine_pool(size: int = 1, tesseract_cmd: Optional[str] = None, warm: bool = False) -> EnginePool:
+    """Replace the process-wide engine pool. Called once per OCR worker process."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = EnginePool(size, default_engine_factory(tesseract_cmd))
+    if warm:
+        _pool.warm()
+    return _pool
+
+
+def get_engine_pool(tesseract_cmd: Optional[str] = None) -> EnginePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EnginePool(1, default_engine_factory(tesseract_cmd))
+        return _pool
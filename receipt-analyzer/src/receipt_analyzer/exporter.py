@@ -1,13 +1,246 @@
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import date
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, get_args
+from urllib.parse import quote
 import pandas as pd
 from .logger import get_logger
+from .models import ParsedReceipt
 
 logger = get_logger(__name__)
 
+COLUMNS = ["file_name", "vendor", "date", "total_amount", "tax", "confidence", "raw_text"]
+
 def export_to_excel(rows: List[Dict[str, Any]], output: Path) -> None:
     df = pd.DataFrame(rows)
-    cols = ["file_name", "vendor", "date", "total_amount", "tax", "confidence", "raw_text"]
-    df = df.reindex(columns=[c for c in cols if c in df.columns])
+    df = df.reindex(columns=[c for c in COLUMNS if c in df.columns])
     df.to_excel(output, index=False, engine="openpyxl")
     logger.info("Exported %d rows to %s", len(df), output)
+
+
+class StreamWriter:
+    """Base for row-at-a-time writers. Rows are flushed to disk every ``flush_every`` rows."""
+
+    def __init__(self, output: Path, flush_every: int = 50):
+        self.output = Path(output)
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._write([row.get(c) for c in COLUMNS])
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def _write(self, values: List[Any]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+        logger.info("Exported %d rows to %s", self.count, self.output)
+
+    def __enter__(self) -> "StreamWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _FileWriter(StreamWriter):
+    def __init__(self, output: Path, flush_every: int = 50):
+        super().__init__(output, flush_every)
+        self._f = open(self.output, "w", encoding="utf-8", newline="")
+
+    def flush(self) -> None:
+        # fsync so a crash after a flush never loses the rows written before it
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        super().close()
+        self._f.close()
+
+
+class CsvStreamWriter(_FileWriter):
+    def __init__(self, output: Path, flush_every: int = 50):
+        super().__init__(output, flush_every)
+        self._csv = csv.writer(self._f)
+        self._csv.writerow(COLUMNS)
+
+    def _write(self, values: List[Any]) -> None:
+        self._csv.writerow(["" if v is None else v for v in values])
+
+
+class JsonlStreamWriter(_FileWriter):
+    def _write(self, values: List[Any]) -> None:
+        self._f.write(json.dumps(dict(zip(COLUMNS, values)), ensure_ascii=False) + "\n")
+
+
+class XlsxStreamWriter(StreamWriter):
+    """openpyxl write-only workbook; memory stays flat regardless of row count.
+
+    An XLSX is only readable once saved, so rows are also journaled to
+    ``<output>.partial.jsonl`` and the workbook is written to a temp file that
+    replaces ``output`` on close. A crash leaves the previous output intact and
+    the journal holding every row flushed so far.
+    """
+
+    def __init__(self, output: Path, flush_every: int = 50):
+        from openpyxl import Workbook
+        super().__init__(output, flush_every)
+        self.journal_path = self.output.with_name(self.output.name + ".partial.jsonl")
+        if self.journal_path.exists():
+            logger.warning("Found %s from an interrupted run; it will be overwritten", self.journal_path)
+        self._journal = JsonlStreamWriter(self.journal_path, flush_every)
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet()
+        self._ws.append(COLUMNS)
+
+    def _write(self, values: List[Any]) -> None:
+        self._ws.append(values)
+        self._journal._write(values)
+
+    def flush(self) -> None:
+        self._journal.flush()
+
+    def close(self) -> None:
+        self._journal.close()
+        tmp = self.output.with_name(self.output.name + ".tmp")
+        self._wb.save(tmp)
+        os.replace(tmp, self.output)
+        self.journal_path.unlink()
+        logger.info("Exported %d rows to %s", self.count, self.output)
+
+
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+PARTITIONS = ("month", "vendor")
+
+def receipt_schema(exclude: List[str] = ()):
+    """Arrow schema for output rows, derived from the ParsedReceipt fields."""
+    import pyarrow as pa
+    py_types = {str: pa.string(), float: pa.float64(), int: pa.int64()}
+    fields = []
+    for name in COLUMNS:
+        if name in exclude:
+            continue
+        if name == "date":
+            typ = pa.date32()
+        elif name in ParsedReceipt.model_fields:
+            annotation = ParsedReceipt.model_fields[name].annotation
+            typ = next((py_types[t] for t in get_args(annotation) or (annotation,) if t in py_types), pa.string())
+        else:
+            typ = pa.string()
+        fields.append(pa.field(name, typ, nullable=name != "file_name"))
+    return pa.schema(fields)
+
+
+def _to_date(value: Any) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+class ParquetStreamWriter(StreamWriter):
+    """Parquet dataset writer: ``output`` is a directory of part files.
+
+    Rows are buffered and written as row groups of ``row_group_size``. With
+    ``partition_by`` ("month" or "vendor") files go into Hive-style
+    ``key=value`` directories. Part files are written under a hidden
+    in-progress name and renamed on close, so readers never see a truncated
+    file. With ``append=True`` existing parts are kept and this run adds new
+    ones; otherwise they are replaced once the new parts are complete.
+    """
+
+    def __init__(self, output: Path, row_group_size: int = 10000,
+                 partition_by: Optional[str] = None, append: bool = False):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from exc
+        if partition_by is not None and partition_by not in PARTITIONS:
+            raise ValueError(f"Unsupported partition_by: {partition_by} (expected one of {', '.join(PARTITIONS)})")
+        super().__init__(output, row_group_size)
+        self.partition_by = partition_by
+        self.append = append
+        self.output.mkdir(parents=True, exist_ok=True)
+        self._previous = [] if append else list(self.output.rglob("*.parquet"))
+        self._schema = receipt_schema(exclude=["vendor"] if partition_by == "vendor" else [])
+        self._run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._writers: Dict[str, Any] = {}
+
+    def _partition(self, row: Dict[str, Any]) -> str:
+        if self.partition_by == "month":
+            d = _to_date(row.get("date"))
+            return f"year={d.year}/month={d.month:02d}" if d else f"year={HIVE_NULL}/month={HIVE_NULL}"
+        if self.partition_by == "vendor":
+            vendor = row.get("vendor")
+            return f"vendor={quote(str(vendor), safe=' ')}" if vendor else f"vendor={HIVE_NULL}"
+        return ""
+
+    def write(self, row: Dict[str, Any]) -> None:
+        part = self._partition(row)
+        buf = self._buffers.setdefault(part, [])
+        buf.append({name: row.get(name) for name in self._schema.names})
+        self.count += 1
+        if len(buf) >= self.flush_every:
+            self._write_group(part)
+
+    def _write_group(self, part: str) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        rows = self._buffers.pop(part, [])
+        if not rows:
+            return
+        columns = {name: [r[name] for r in rows] for name in self._schema.names}
+        if "date" in columns:
+            columns["date"] = [_to_date(v) for v in columns["date"]]
+        table = pa.table(columns, schema=self._schema)
+        if part not in self._writers:
+            directory = self.output / part if part else self.output
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = directory / f".part-{self._run_id}.parquet.inprogress"
+            self._writers[part] = (pq.ParquetWriter(str(tmp), self._schema, compression="zstd"), tmp)
+        self._writers[part][0].write_table(table)
+
+    def flush(self) -> None:
+        for part in list(self._buffers):
+            self._write_group(part)
+
+    def close(self) -> None:
+        self.flush()
+        for writer, tmp in self._writers.values():
+            writer.close()
+            tmp.rename(tmp.with_name(f"part-{self._run_id}.parquet"))
+        for old in self._previous:
+            old.unlink(missing_ok=True)
+        logger.info("Exported %d rows to %s (%d part files)", self.count, self.output, len(self._writers))
+
+
+WRITERS = {
+    ".csv": CsvStreamWriter,
+    ".jsonl": JsonlStreamWriter,
+    ".xlsx": XlsxStreamWriter,
+    ".parquet": ParquetStreamWriter,
+}
+
+def supports_append(output: Path) -> bool:
+    return Path(output).suffix.lower() == ".parquet"
+
+def open_writer(output: Path, flush_every: int = 50, append: bool = False,
+                partition_by: Optional[str] = None, row_group_size: int = 10000) -> StreamWriter:
+    suffix = Path(output).suffix.lower()
+    if suffix == ".parquet":
+        return ParquetStreamWriter(output, row_group_size, partition_by, append)
+    writer = WRITERS.get(suffix)
+    if writer is None:
+        raise ValueError(f"Unsupported output format: {output} (expected one of {', '.join(WRITERS)})")
+    return writer(output, flush_every)
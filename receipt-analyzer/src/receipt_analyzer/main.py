@@ -1,54 +1,172 @@
+import asyncio
+import signal
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
-from .config import load_config
+from typing import Callable, List, Dict, Any, Optional
+from .cache import DiskCache, open_ocr_cache, open_llm_cache
+from .config import Settings, load_config
 from .logger import get_logger
 from .ocr import image_to_text
-from .parser import parse_receipt_text
-from .exporter import export_to_excel
+from .pipeline import Pipeline, extract_stage, make_row, failed_row
+from .exporter import open_writer, supports_append
+from .manifest import Manifest
 
 logger = get_logger(__name__)
 
-def process_file(path: Path, cfg) -> Dict[str, Any]:
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tiff"}
+
+def process_file(path: Path, cfg, ocr_cache: Optional[DiskCache] = None,
+                 llm_cache: Optional[DiskCache] = None) -> Dict[str, Any]:
     logger.info("Processing %s", path.name)
     try:
-        text = image_to_text(path, tesseract_cmd=cfg.tesseract_cmd)
-        parsed = parse_receipt_text(text, model=cfg.ollama_model, ollama_cmd=cfg.ollama_cmd, timeout=cfg.ollama_timeout)
-        return {
-            "file_name": path.name,
-            "vendor": parsed.vendor,
-            "date": parsed.date,
-            "total_amount": parsed.total_amount,
-            "tax": parsed.tax,
-            "confidence": parsed.confidence,
-            "raw_text": text[:1000]
-        }
+        text = image_to_text(path, tesseract_cmd=cfg.tesseract_cmd, cache=ocr_cache,
+                             profile=cfg.preprocess_profile, min_confidence=cfg.ocr_min_confidence)
+        parsed = extract_stage(text, cfg, cache=llm_cache)
+        return make_row(path, parsed, text)
     except Exception as exc:
         logger.exception("Failed to process %s: %s", path.name, exc)
-        return {
-            "file_name": path.name,
-            "vendor": None,
-            "date": None,
-            "total_amount": None,
-            "tax": None,
-            "confidence": None,
-            "raw_text": ""
-        }
-
-def run() -> None:
-    cfg = load_config()
+        return failed_row(path, str(exc))
+
+def _setup(cfg: Optional[Settings]) -> Settings:
+    cfg = cfg or load_config()
     # reconfigure logger with configured level
     global logger
     logger = get_logger("receipt_analyzer", level=cfg.log_level)
+    return cfg
+
+def list_receipts(cfg: Settings) -> List[Path]:
     receipts_dir = Path(cfg.receipts_dir)
     if not receipts_dir.exists():
         logger.error("Receipts directory does not exist: %s", receipts_dir)
         raise SystemExit(1)
-    image_files = [p for p in receipts_dir.iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg", ".tiff"}]
+    image_files = [p for p in receipts_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES]
     logger.info("Found %d images in %s", len(image_files), receipts_dir)
-    results: List[Dict[str, Any]] = []
-    with ThreadPoolExecutor(max_workers=cfg.max_workers) as ex:
-        futures = {ex.submit(process_file, p, cfg): p for p in image_files}
-        for fut in as_completed(futures):
-            results.append(fut.result())
-    export_to_excel(results, Path(cfg.output_excel))
+    return image_files
+
+def open_manifest(cfg: Settings) -> Manifest:
+    path = cfg.manifest_path or Path(cfg.output_excel).with_suffix(".manifest.sqlite")
+    return Manifest(Path(path))
+
+def process_all(cfg: Settings, image_files: List[Path],
+                on_row: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    if not image_files:
+        return []
+    # Clear (if requested) in the parent before OCR workers open their own connections.
+    ocr_cache = open_ocr_cache(cfg, clear=cfg.ocr_cache_clear)
+    with Pipeline(cfg) as pipeline:
+        results: List[Dict[str, Any]] = pipeline.run(image_files, on_row=on_row)
+    if ocr_cache is not None:
+        stats = ocr_cache.stats()
+        logger.info("OCR cache: %d hits, %d misses, %d entries (%d bytes)",
+                    pipeline.ocr_cache_hits, pipeline.ocr_cache_misses, stats["entries"], stats["bytes"])
+        ocr_cache.close()
+    return results
+
+def run(cfg: Optional[Settings] = None, full: bool = False) -> None:
+    """Process new or changed receipts and rewrite the output from the manifest.
+
+    Unchanged rows are copied from the manifest first, then new rows are
+    streamed to the output as they complete. With ``full=True`` the manifest
+    is reset and every receipt is reprocessed.
+    """
+    cfg = _setup(cfg)
+    image_files = list_receipts(cfg)
+    manifest = open_manifest(cfg)
+    try:
+        if full:
+            manifest.clear()
+        pruned = manifest.prune(image_files)
+        pending = [p for p in image_files if manifest.needs_processing(p)]
+        logger.info("%d new or changed receipts, %d unchanged, %d removed",
+                    len(pending), len(image_files) - len(pending), pruned)
+        by_name = {p.name: p for p in pending}
+        output = Path(cfg.output_excel)
+        # Append-capable outputs (Parquet) only get the new rows, unless an
+        # existing row changed or vanished and the old one must be dropped.
+        append = (supports_append(output) and output.exists() and not full and not pruned
+                  and not any(manifest.lookup(p) is not None for p in pending))
+        with open_writer(output, cfg.export_flush_every, append=append,
+                         partition_by=cfg.parquet_partition_by,
+                         row_group_size=cfg.parquet_row_group_size) as writer:
+            if not append:
+                for row in manifest.iter_rows(exclude=pending):
+                    writer.write(row)
+
+            def on_row(row: Dict[str, Any]) -> None:
+                # failed rows are exported but not recorded, so they are retried next run
+                if "error" not in row:
+                    manifest.record(by_name[row["file_name"]], row)
+                writer.write(row)
+
+            process_all(cfg, pending, on_row=on_row)
+    finally:
+        manifest.close()
+
+def watch(cfg: Optional[Settings] = None) -> None:
+    """Process receipts as they arrive until interrupted (SIGINT/SIGTERM)."""
+    from .watch import ReceiptWatcher
+    cfg = _setup(cfg)
+    list_receipts(cfg)  # validates receipts_dir
+    if cfg.ocr_cache_clear:
+        open_ocr_cache(cfg, clear=True).close()
+    manifest = open_manifest(cfg)
+    watcher = ReceiptWatcher(cfg, manifest, IMAGE_SUFFIXES)
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, watcher.stop)
+        await watcher.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    finally:
+        manifest.close()
+
+def serve(cfg: Optional[Settings] = None, host: Optional[str] = None, port: Optional[int] = None,
+          stub_llm: bool = False) -> None:
+    """Run the HTTP extraction service until interrupted (SIGINT/SIGTERM)."""
+    from .server import ExtractionServer, RuleExtractor
+    cfg = _setup(cfg)
+    server = ExtractionServer(cfg, extractor=RuleExtractor() if stub_llm else None)
+
+    async def serve_forever() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await server.start(host or cfg.serve_host, cfg.serve_port if port is None else port)
+        try:
+            await stop.wait()
+        finally:
+            await server.close()
+
+    asyncio.run(serve_forever())
+
+def warm_caches(cfg: Optional[Settings] = None) -> None:
+    """Run OCR and extraction over receipts_dir to fill the caches, without writing output."""
+    cfg = _setup(cfg)
+    results = process_all(cfg, list_receipts(cfg))
+    logger.info("Warmed caches with %d receipts", len(results))
+
+def open_caches(cfg: Settings, kind: str) -> Dict[str, DiskCache]:
+    caches = {}
+    if kind in ("ocr", "all"):
+        caches["ocr"] = open_ocr_cache(cfg)
+    if kind in ("llm", "all"):
+        caches["llm"] = open_llm_cache(cfg)
+    return {name: cache for name, cache in caches.items() if cache is not None}
+
+def cache_stats(cfg: Optional[Settings] = None, kind: str = "all") -> Dict[str, Dict[str, Any]]:
+    cfg = _setup(cfg)
+    stats = {}
+    for name, cache in open_caches(cfg, kind).items():
+        expired = cache.purge_expired()
+        stats[name] = dict(cache.stats(), path=str(cache.path), expired_purged=expired)
+        cache.close()
+    return stats
+
+def clear_caches(cfg: Optional[Settings] = None, kind: str = "all") -> None:
+    cfg = _setup(cfg)
+    for cache in open_caches(cfg, kind).values():
+        cache.clear()
+        cache.close()
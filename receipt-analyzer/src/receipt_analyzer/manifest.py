@@ -0,0 +1,112 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    row TEXT NOT NULL,
+    processed_at REAL NOT NULL
+)
+"""
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    """Run manifest: which files were processed, in what state, and what they produced."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def needs_processing(self, path: Path) -> bool:
+        """True if the file is new or its content changed since it was recorded."""
+        key = str(path.resolve())
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return True
+        st = path.stat()
+        if (st.st_size, st.st_mtime_ns) == (row[0], row[1]):
+            return False
+        # Touched but possibly unchanged (copied, restored from backup): fall back to the content hash
+        if st.st_size == row[0] and file_sha256(path) == row[2]:
+            with self._lock:
+                self._conn.execute("UPDATE files SET mtime_ns = ? WHERE path = ?", (st.st_mtime_ns, key))
+                self._conn.commit()
+            return False
+        return True
+
+    def record(self, path: Path, row: Dict[str, Any]) -> None:
+        st = path.stat()
+        digest = file_sha256(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, row, processed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path.resolve()), st.st_size, st.st_mtime_ns, digest, json.dumps(row), time.time()),
+            )
+            self._conn.commit()
+
+    def prune(self, keep: Iterable[Path]) -> int:
+        """Forget files that are no longer in the receipts folder."""
+        keep_keys = {str(p.resolve()) for p in keep}
+        with self._lock:
+            stale = [k for (k,) in self._conn.execute("SELECT path FROM files") if k not in keep_keys]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in stale])
+            self._conn.commit()
+        return len(stale)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self.iter_rows())
+
+    def iter_rows(self, exclude: Iterable[Path] = (), page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream recorded rows a page at a time, skipping ``exclude`` (e.g. files about to be reprocessed)."""
+        skip = {str(p.resolve()) for p in exclude}
+        last = ""
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT path, row FROM files WHERE path > ? ORDER BY path LIMIT ?", (last, page_size)
+                ).fetchall()
+            if not page:
+                return
+            for key, row in page:
+                if key not in skip:
+                    yield json.loads(row)
+            last = page[-1][0]
+
+    def lookup(self, path: Path) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT row FROM files WHERE path = ?", (str(path.resolve()),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,48 +1,129 @@
 from pathlib import Path
+from typing import Optional, Tuple
 import cv2
 import numpy as np
-from PIL import Image
-import pytesseract
+from .cache import DiskCache, make_key
+from .engine import TESSERACT_CONFIG, get_engine_pool
 from .logger import get_logger
 
 logger = get_logger(__name__)
 
-def preprocess_image(path: Path) -> np.ndarray:
-    arr = np.fromfile(str(path), dtype=np.uint8)
+# Tesseract is most accurate with capital letters roughly 20–40 px tall.
+TARGET_TEXT_HEIGHT = 30.0
+# Estimated noise sigma below which an image counts as clean and skips heavy denoising.
+CLEAN_NOISE_SIGMA = 4.0
+
+# Anything that changes preprocess_image output must be reflected here, otherwise
+# stale OCR results will be served from the cache.
+PROFILES = {
+    "fast": {"default_scale": 1.0, "max_scale": 2.0, "denoise": "median", "sharpen": False},
+    "balanced": {"default_scale": 1.5, "max_scale": 2.5, "denoise": "bilateral", "sharpen": True},
+    "quality": {"default_scale": 2.0, "max_scale": 3.0, "denoise": "nlmeans", "sharpen": True},
+}
+AUTO_PROFILE = "auto"
+
+SHARPEN_KERNEL = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+
+def load_gray(path: Path, data: Optional[bytes] = None) -> np.ndarray:
+    if data is None:
+        arr = np.fromfile(str(path), dtype=np.uint8)
+    else:
+        arr = np.frombuffer(data, dtype=np.uint8)
     img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
     if img is None:
         raise FileNotFoundError(f"Cannot read image: {path}")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """Median height of glyph-sized connected components, or None if too few were found."""
+    _, inv = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(inv, connectivity=8)
+    w = stats[1:, cv2.CC_STAT_WIDTH]
+    h = stats[1:, cv2.CC_STAT_HEIGHT]
+    glyphs = (h >= 4) & (h <= gray.shape[0] / 8) & (w <= 4 * h)
+    if np.count_nonzero(glyphs) < 10:
+        return None
+    return float(np.median(h[glyphs]))
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """Robust noise sigma from the median absolute deviation of a 3x3 median residual."""
+    residual = cv2.absdiff(gray, cv2.medianBlur(gray, 3))
+    return float(np.median(residual)) * 1.4826
 
-    # Resize up 2–3× if screenshot is low-res (very common)
-    h, w = img.shape[:2]
-    scale = 2.0
-    img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+def choose_scale(gray: np.ndarray, profile: str) -> float:
+    params = PROFILES[profile]
+    text_height = estimate_text_height(gray)
+    if text_height is None:
+        return params["default_scale"]
+    return float(np.clip(TARGET_TEXT_HEIGHT / text_height, 0.5, params["max_scale"]))
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    denoised = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
+def preprocess_gray(gray: np.ndarray, profile: str = "quality") -> np.ndarray:
+    params = PROFILES[profile]
+    clean = estimate_noise(gray) < CLEAN_NOISE_SIGMA
 
-    # Try bilateral filter instead of (or after) fastNlMeans — preserves edges better
-    bilateral = cv2.bilateralFilter(denoised, d=9, sigmaColor=75, sigmaSpace=75)
+    # Resize so glyphs land near TARGET_TEXT_HEIGHT instead of a fixed 2x
+    scale = choose_scale(gray, profile)
+    if abs(scale - 1.0) > 0.1:
+        interpolation = cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
 
-    # Sharpen a bit
-    kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-    sharpened = cv2.filter2D(bilateral, -1, kernel)
+    if params["denoise"] == "nlmeans":
+        gray = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
+        # Bilateral after fastNlMeans — preserves edges better
+        gray = cv2.bilateralFilter(gray, d=9, sigmaColor=75, sigmaSpace=75)
+    elif clean:
+        pass
+    elif params["denoise"] == "bilateral":
+        gray = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
+    elif params["denoise"] == "median":
+        gray = cv2.medianBlur(gray, 3)
+
+    if params["sharpen"]:
+        gray = cv2.filter2D(gray, -1, SHARPEN_KERNEL)
 
     # Threshold — Gaussian often good, but try Otsu too
-    # th = cv2.adaptiveThreshold(sharpened, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2)
-    _, th = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2)
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
     # Optional: invert if text is light on dark (some thermal prints)
     # th = cv2.bitwise_not(th)
 
+    logger.debug("Preprocessed with profile=%s scale=%.2f clean=%s", profile, scale, clean)
     return th
 
-def image_to_text(path: Path, tesseract_cmd: str | None = None) -> str:
-    if tesseract_cmd:
-        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-    img = preprocess_image(path)
-    pil = Image.fromarray(img)
-    config = r'--oem 1 --psm 6 -l eng'
-    text = pytesseract.image_to_string(pil, config=config)
-    logger.debug("OCR text length: %d for %s", len(text), path.name)
+def preprocess_image(path: Path, data: Optional[bytes] = None, profile: str = "quality") -> np.ndarray:
+    return preprocess_gray(load_gray(path, data), profile)
+
+def run_tesseract(img: np.ndarray, tesseract_cmd: Optional[str] = None) -> Tuple[str, float]:
+    """OCR a preprocessed image, returning the text and the mean word confidence (0–100)."""
+    return get_engine_pool(tesseract_cmd).recognize(img)
+
+def ocr_cache_key(data: bytes, profile: str, min_confidence: float) -> str:
+    return make_key(data, profile, min_confidence, PROFILES, TARGET_TEXT_HEIGHT, CLEAN_NOISE_SIGMA, TESSERACT_CONFIG)
+
+def image_to_text(path: Path, tesseract_cmd: str | None = None, cache: Optional[DiskCache] = None,
+                  profile: str = AUTO_PROFILE, min_confidence: float = 60.0) -> str:
+    if profile != AUTO_PROFILE and profile not in PROFILES:
+        raise ValueError(f"Unknown preprocessing profile: {profile}")
+    data = None
+    key = None
+    if cache is not None:
+        data = path.read_bytes()
+        key = ocr_cache_key(data, profile, min_confidence)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("OCR cache hit for %s", path.name)
+            return cached.decode("utf-8")
+    gray = load_gray(path, data)
+    if profile == AUTO_PROFILE:
+        # Cheap pass first; only pay for NL-means when Tesseract is unsure.
+        text, confidence = run_tesseract(preprocess_gray(gray, "fast"), tesseract_cmd)
+        if confidence < min_confidence:
+            logger.debug("Low OCR confidence %.1f for %s, escalating to quality profile", confidence, path.name)
+            text, confidence = run_tesseract(preprocess_gray(gray, "quality"), tesseract_cmd)
+    else:
+        text, confidence = run_tesseract(preprocess_gray(gray, profile), tesseract_cmd)
+    logger.debug("OCR text length: %d (confidence %.1f) for %s", len(text), confidence, path.name)
+    if cache is not None:
+        cache.set(key, text.encode("utf-8"))
     return text
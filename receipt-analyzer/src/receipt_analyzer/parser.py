@@ -1,10 +1,14 @@
+import asyncio
 import subprocess
 import json
+import threading
 import ollama
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from .cache import DiskCache, make_key, open_llm_cache
 from .logger import get_logger
 from .models import ParsedReceipt
+from .rules import extract_with_rules
 from .utils import normalize_amount, normalize_date
 
 logger = get_logger(__name__)
@@ -30,30 +34,77 @@ OCR Text:
 \"\"\"{ocr_text}\"\"\"
 """
 
+BATCH_PROMPT_TEMPLATE = """
+You are an expert at extracting data from Canadian receipts. Output ONLY JSON.
+Below are {count} separate receipts, each starting with a line "### RECEIPT <n> ###".
+Look carefully at numbers near words like "TOTAL", "Sales Tax", "HST", "Subtotal", "Grand Total", "Amount Due".
+Tax is usually ~13% in Ontario (HST).
+Do NOT guess or hallucinate numbers — if unclear, put null.
+Never mix values between receipts.
+
+Return ONLY valid JSON with exactly {count} entries in "receipts", in the same order as the input:
+{{
+  "receipts": [
+    {{"vendor": "null", "date": "YYYY-MM-DD", "total_amount": 0.0, "tax": 0.0, "confidence": 0.0}}
+  ]
+}}
+
+
+{receipts}
+"""
+
+DEFAULT_OPTIONS = {
+    "temperature": 0.0,      # deterministic → good for strict JSON
+    "num_ctx": 4096,         # adjust higher if receipts are very long
+    "num_predict": 512,      # cap output to prevent runaway generation
+}
+
 class OllamaError(RuntimeError):
     pass
 
 
 from ollama import ResponseError  # optional, for nicer errors
 
+_clients: Dict[Tuple[Optional[str], int], ollama.Client] = {}
+_clients_lock = threading.Lock()
+
+def get_client(host: Optional[str], timeout: int) -> ollama.Client:
+    """Shared sync client per (host, timeout) so HTTP connections are pooled across calls."""
+    with _clients_lock:
+        client = _clients.get((host, timeout))
+        if client is None:
+            client = _clients[(host, timeout)] = ollama.Client(host=host, timeout=timeout)
+        return client
+
+def response_cache_key(model: str, options: Dict[str, Any], prompt: str) -> str:
+    return make_key(model, "json", sorted(options.items()), prompt)
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=1, max=10),
     retry=retry_if_exception_type(OllamaError)
 )
-def call_ollama(prompt: str, model: str, ollama_cmd: str, timeout: int) -> str:
+def call_ollama(prompt: str, model: str, ollama_cmd: str, timeout: int,
+                host: Optional[str] = None, keep_alive: Optional[str] = None,
+                cache: Optional[DiskCache] = None) -> str:
+    # ollama_cmd is kept for config compatibility; requests go over the HTTP API.
+    key = response_cache_key(model, DEFAULT_OPTIONS, prompt)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
     try:
-        response = ollama.generate(
+        response = get_client(host, timeout).generate(
             model=model,
             prompt=prompt,
             format="json",
-            options={
-                "temperature": 0.0,      # deterministic → good for strict JSON
-                "num_ctx": 4096,         # adjust higher if receipts are very long
-                "num_predict": 512,      # cap output to prevent runaway generation
-            }
+            options=DEFAULT_OPTIONS,
+            keep_alive=keep_alive,
         )
-        return response['response'].strip()
+        text = response['response'].strip()
+        if cache is not None:
+            cache.set(key, text.encode("utf-8"))
+        return text
     except ResponseError as e:
         logger.warning(f"Ollama API error {e.status_code}: {e.error}")
         raise OllamaError(f"Ollama error: {e.error}") from e
@@ -73,20 +124,188 @@ def extract_json_from_output(raw: str) -> dict:
         logger.error("Failed to extract JSON: %s", exc)
         raise ValueError("Invalid JSON from Ollama") from exc
 
-def parse_receipt_text(ocr_text: str, model: str, ollama_cmd: str, timeout: int) -> ParsedReceipt:
-    prompt = PROMPT_TEMPLATE.format(ocr_text=ocr_text)
-    raw = call_ollama(prompt, model=model, ollama_cmd=ollama_cmd, timeout=timeout)
-    data = extract_json_from_output(raw)
-    total = normalize_amount(data.get("total_amount"))
-    tax = normalize_amount(data.get("tax"))
-    date = normalize_date(data.get("date"))
-    vendor = data.get("vendor")
+def receipt_from_dict(data: Dict[str, Any]) -> ParsedReceipt:
     confidence = data.get("confidence")
-    parsed = ParsedReceipt(
-        vendor=vendor,
-        date=date,
-        total_amount=total,
-        tax=tax,
+    return ParsedReceipt(
+        vendor=data.get("vendor"),
+        date=normalize_date(data.get("date")),
+        total_amount=normalize_amount(data.get("total_amount")),
+        tax=normalize_amount(data.get("tax")),
         confidence=float(confidence) if confidence is not None else None
     )
-    return parsed
+
+def try_fast_path(ocr_text: str, threshold: Optional[float]) -> Optional[ParsedReceipt]:
+    """Rule-based result if it is confident enough to skip the LLM, else None."""
+    if threshold is None:
+        return None
+    parsed = extract_with_rules(ocr_text)
+    if parsed.confidence is not None and parsed.confidence >= threshold:
+        return parsed
+    return None
+
+def parse_receipt_text(ocr_text: str, model: str, ollama_cmd: str, timeout: int,
+                       host: Optional[str] = None, keep_alive: Optional[str] = None,
+                       fast_path_threshold: Optional[float] = None,
+                       cache: Optional[DiskCache] = None) -> ParsedReceipt:
+    parsed = try_fast_path(ocr_text, fast_path_threshold)
+    if parsed is not None:
+        return parsed
+    prompt = PROMPT_TEMPLATE.format(ocr_text=ocr_text)
+    raw = call_ollama(prompt, model=model, ollama_cmd=ollama_cmd, timeout=timeout, host=host,
+                      keep_alive=keep_alive, cache=cache)
+    data = extract_json_from_output(raw)
+    return receipt_from_dict(data)
+
+
+class AsyncExtractor:
+    """Async receipt extraction over one shared, connection-pooled Ollama client.
+
+    At most ``max_in_flight`` requests are outstanding at once; set it to the
+    server's OLLAMA_NUM_PARALLEL. With ``batch_size > 1`` concurrent ``parse``
+    calls are packed into a single prompt, and split back per receipt.
+    Must be created and used on a single event loop.
+    """
+
+    def __init__(self, model: str, host: Optional[str] = None, timeout: int = 300,
+                 max_in_flight: int = 4, keep_alive: Optional[str] = "10m",
+                 batch_size: int = 1, batch_wait: float = 0.05,
+                 fast_path_threshold: Optional[float] = None,
+                 cache: Optional[DiskCache] = None):
+        self.model = model
+        self.cache = cache
+        self._owns_cache = False
+        self.fast_path_threshold = fast_path_threshold
+        self.fast_path_count = 0
+        self.llm_count = 0
+        self.keep_alive = keep_alive
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self._client = ollama.AsyncClient(host=host, timeout=timeout)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set = set()
+
+    @classmethod
+    def from_settings(cls, cfg) -> "AsyncExtractor":
+        extractor = cls(
+            model=cfg.ollama_model,
+            host=cfg.ollama_host,
+            timeout=cfg.ollama_timeout,
+            max_in_flight=cfg.llm_workers or cfg.max_workers,
+            keep_alive=cfg.ollama_keep_alive,
+            batch_size=cfg.llm_batch_size,
+            batch_wait=cfg.llm_batch_wait_ms / 1000,
+            fast_path_threshold=cfg.fast_path_threshold if cfg.fast_path_enabled else None,
+            cache=open_llm_cache(cfg),
+        )
+        extractor._owns_cache = True
+        return extractor
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        retry=retry_if_exception_type(OllamaError)
+    )
+    async def generate(self, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        options = options or DEFAULT_OPTIONS
+        key = response_cache_key(self.model, options, prompt)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.decode("utf-8")
+        async with self._slots:
+            try:
+                response = await self._client.generate(
+                    model=self.model,
+                    prompt=prompt,
+                    format="json",
+                    options=options,
+                    keep_alive=self.keep_alive,
+                )
+                text = response['response'].strip()
+            except ResponseError as e:
+                logger.warning(f"Ollama API error {e.status_code}: {e.error}")
+                raise OllamaError(f"Ollama error: {e.error}") from e
+            except Exception as e:
+                logger.warning(f"Ollama failed: {str(e)}")
+                raise OllamaError(f"Ollama failed: {str(e)}") from e
+        if self.cache is not None:
+            self.cache.set(key, text.encode("utf-8"))
+        return text
+
+    async def parse_one(self, ocr_text: str) -> ParsedReceipt:
+        raw = await self.generate(PROMPT_TEMPLATE.format(ocr_text=ocr_text))
+        return receipt_from_dict(extract_json_from_output(raw))
+
+    async def parse_batch(self, texts: List[str]) -> List[ParsedReceipt]:
+        if len(texts) == 1:
+            return [await self.parse_one(texts[0])]
+        body = "\n\n".join(f"### RECEIPT {i + 1} ###\n{t}" for i, t in enumerate(texts))
+        options = dict(DEFAULT_OPTIONS,
+                       num_ctx=min(DEFAULT_OPTIONS["num_ctx"] * len(texts), 32768),
+                       num_predict=DEFAULT_OPTIONS["num_predict"] * len(texts))
+        raw = await self.generate(BATCH_PROMPT_TEMPLATE.format(count=len(texts), receipts=body), options)
+        items = extract_json_from_output(raw).get("receipts")
+        if not isinstance(items, list) or len(items) != len(texts):
+            raise ValueError(f"Expected {len(texts)} receipts in batch response")
+        return [receipt_from_dict(item if isinstance(item, dict) else {}) for item in items]
+
+    async def parse(self, ocr_text: str) -> ParsedReceipt:
+        parsed = try_fast_path(ocr_text, self.fast_path_threshold)
+        if parsed is not None:
+            self.fast_path_count += 1
+            return parsed
+        self.llm_count += 1
+        if self.batch_size == 1:
+            return await self.parse_one(ocr_text)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((ocr_text, fut))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            results = await self.parse_batch(texts)
+        except Exception as exc:
+            logger.warning("Batch extraction of %d receipts failed (%s); retrying one by one", len(texts), exc)
+            results = await asyncio.gather(*(self.parse_one(t) for t in texts), return_exceptions=True)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    async def aclose(self) -> None:
+        total = self.fast_path_count + self.llm_count
+        if total:
+            logger.info("Extraction: %d/%d receipts via rule-based fast path (%.0f%%), %d via LLM",
+                        self.fast_path_count, total, 100.0 * self.fast_path_count / total, self.llm_count)
+        if self._pending:
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self._client.close()
+        if self.cache is not None:
+            stats = self.cache.stats()
+            logger.info("LLM cache: %d hits, %d misses, %d entries (%d bytes)",
+                        stats["hits"], stats["misses"], stats["entries"], stats["bytes"])
+            if self._owns_cache:
+                self.cache.close()
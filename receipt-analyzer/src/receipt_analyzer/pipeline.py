@@ -0,0 +1,216 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Protocol, Sequence
+from .cache import DiskCache, open_ocr_cache
+from .engine import configure_engine_pool
+from .logger import get_logger
+from .models import ParsedReceipt
+from .ocr import image_to_text
+from .parser import AsyncExtractor, parse_receipt_text
+
+logger = get_logger(__name__)
+
+# Per-process OCR cache, opened by the process pool initializer.
+_ocr_cache: Optional[DiskCache] = None
+
+
+class OcrResult(NamedTuple):
+    text: str
+    cache_hit: Optional[bool]
+
+
+class Extractor(Protocol):
+    async def parse(self, ocr_text: str) -> ParsedReceipt: ...
+    async def aclose(self) -> None: ...
+
+
+def init_ocr_worker(cfg) -> None:
+    global _ocr_cache
+    _ocr_cache = open_ocr_cache(cfg)
+    # Load the Tesseract model once per worker instead of once per image
+    configure_engine_pool(cfg.ocr_engines, cfg.tesseract_cmd, warm=True)
+
+
+def ocr_stage(path: Path, cfg) -> OcrResult:
+    """Decode, preprocess and OCR one file. Runs inside the OCR process pool."""
+    hits = _ocr_cache.hits if _ocr_cache is not None else None
+    text = image_to_text(path, tesseract_cmd=cfg.tesseract_cmd, cache=_ocr_cache,
+                         profile=cfg.preprocess_profile, min_confidence=cfg.ocr_min_confidence)
+    return OcrResult(text, None if hits is None else _ocr_cache.hits > hits)
+
+
+def extract_stage(text: str, cfg, cache: Optional[DiskCache] = None) -> ParsedReceipt:
+    return parse_receipt_text(text, model=cfg.ollama_model, ollama_cmd=cfg.ollama_cmd, timeout=cfg.ollama_timeout,
+                              host=cfg.ollama_host, keep_alive=cfg.ollama_keep_alive,
+                              fast_path_threshold=cfg.fast_path_threshold if cfg.fast_path_enabled else None,
+                              cache=cache)
+
+
+def make_row(path: Path, parsed: ParsedReceipt, text: str) -> Dict[str, Any]:
+    return {
+        "file_name": path.name,
+        "vendor": parsed.vendor,
+        "date": parsed.date,
+        "total_amount": parsed.total_amount,
+        "tax": parsed.tax,
+        "confidence": parsed.confidence,
+        "raw_text": text[:1000]
+    }
+
+
+def failed_row(path: Path, error: str = "failed") -> Dict[str, Any]:
+    # "error" is not exported; it marks rows that must be retried on the next run
+    return {
+        "error": error,
+        "file_name": path.name,
+        "vendor": None,
+        "date": None,
+        "total_amount": None,
+        "tax": None,
+        "confidence": None,
+        "raw_text": ""
+    }
+
+
+class Pipeline:
+    """Two-stage receipt pipeline.
+
+    OCR runs in a process pool (CPU bound), extraction runs on asyncio with its
+    own concurrency limit (I/O bound). A bounded queue between the stages stops
+    OCR from running arbitrarily far ahead of the LLM.
+
+    The extractor defaults to an AsyncExtractor built from the settings; it is
+    created lazily on the running event loop and closed by ``aclose``.
+    """
+
+    def __init__(self, cfg,
+                 ocr_fn: Callable[[Path, Any], OcrResult] = ocr_stage,
+                 extractor: Optional[Extractor] = None):
+        self.cfg = cfg
+        self.ocr_fn = ocr_fn
+        self.extractor = extractor
+        self.ocr_workers = cfg.ocr_workers or cfg.max_workers
+        self.llm_workers = cfg.llm_workers or cfg.max_workers
+        # Enough consumers to fill every batch on every in-flight request
+        self.llm_consumers = self.llm_workers * max(1, cfg.llm_batch_size)
+        self.ocr_cache_hits = 0
+        self.ocr_cache_misses = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._owns_extractor = extractor is None
+
+    def start(self) -> "Pipeline":
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.ocr_workers,
+                initializer=init_ocr_worker,
+                initargs=(self.cfg,),
+            )
+        return self
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def aclose(self) -> None:
+        if self._owns_extractor and self.extractor is not None:
+            await self.extractor.aclose()
+            self.extractor = None
+
+    def __enter__(self) -> "Pipeline":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def ocr(self, path: Path) -> str:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.start()._pool, self.ocr_fn, path, self.cfg)
+        if result.cache_hit is True:
+            self.ocr_cache_hits += 1
+        elif result.cache_hit is False:
+            self.ocr_cache_misses += 1
+        return result.text
+
+    async def extract(self, path: Path, text: str) -> Dict[str, Any]:
+        if self.extractor is None:
+            self.extractor = AsyncExtractor.from_settings(self.cfg)
+        try:
+            parsed = await self.extractor.parse(text)
+            return make_row(path, parsed, text)
+        except Exception as exc:
+            logger.exception("Failed to extract %s: %s", path.name, exc)
+            return failed_row(path, str(exc))
+
+    async def process(self, path: Path) -> Dict[str, Any]:
+        logger.info("Processing %s", path.name)
+        try:
+            text = await self.ocr(path)
+        except Exception as exc:
+            logger.exception("Failed to OCR %s: %s", path.name, exc)
+            return failed_row(path, str(exc))
+        return await self.extract(path, text)
+
+    async def stream(self, paths: Sequence[Path]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one row per path, in completion order."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.cfg.queue_size)
+        rows: asyncio.Queue = asyncio.Queue()
+        ocr_slots = asyncio.Semaphore(self.ocr_workers)
+
+        async def ocr_one(path: Path) -> None:
+            logger.info("Processing %s", path.name)
+            try:
+                item = (path, await self.ocr(path), None)
+            except Exception as exc:
+                logger.exception("Failed to OCR %s: %s", path.name, exc)
+                item = (path, None, str(exc))
+            # Holding the OCR slot until the queue accepts the item is what
+            # provides backpressure when extraction falls behind.
+            await queue.put(item)
+            ocr_slots.release()
+
+        async def produce() -> None:
+            tasks = []
+            for path in paths:
+                await ocr_slots.acquire()
+                tasks.append(asyncio.create_task(ocr_one(path)))
+            await asyncio.gather(*tasks)
+            for _ in range(self.llm_consumers):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                path, text, error = item
+                row = failed_row(path, error) if text is None else await self.extract(path, text)
+                await rows.put(row)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume()) for _ in range(self.llm_consumers)]
+        try:
+            for _ in range(len(paths)):
+                yield await rows.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, paths: Sequence[Path],
+            on_row: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Process ``paths`` to completion. With ``on_row`` each row is handed over
+        as soon as it completes and not accumulated, so memory stays flat."""
+        async def collect() -> List[Dict[str, Any]]:
+            rows = []
+            try:
+                async for row in self.stream(paths):
+                    if on_row is None:
+                        rows.append(row)
+                    else:
+                        on_row(row)
+                return rows
+            finally:
+                await self.aclose()
+        return asyncio.run(collect())
@@ -0,0 +1,90 @@
+import re
+from typing import List, Optional
+from .models import ParsedReceipt
+from .utils import normalize_amount, normalize_date
+
+HST_RATE = 0.13
+# Rounding on the receipt itself can put sums a cent or two off.
+AMOUNT_TOLERANCE = 0.02
+
+AMOUNT_RE = re.compile(r"-?\$?\s*\d{1,3}(?:[,\s]\d{3})*\.\d{2}(?!\d)|-?\$?\s*\d+\.\d{2}(?!\d)")
+SUBTOTAL_RE = re.compile(r"\bsub[\s\-]*total\b", re.I)
+TAX_RE = re.compile(r"\b(?:hst|gst|pst|qst|tax)\b", re.I)
+TOTAL_RE = re.compile(r"\b(?:grand\s+total|total|amount\s+due|balance\s+due)\b", re.I)
+DATE_RES = [
+    re.compile(r"\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b"),
+    re.compile(r"\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b"),
+    re.compile(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{2,4}\b", re.I),
+    re.compile(r"\b\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{2,4}\b", re.I),
+]
+VENDOR_RE = re.compile(r"[A-Za-z][A-Za-z&'.\- ]{2,}")
+
+
+def _last_amount(line: str) -> Optional[float]:
+    matches = AMOUNT_RE.findall(line)
+    return normalize_amount(matches[-1].replace(" ", "")) if matches else None
+
+
+def _find_date(lines: List[str]) -> Optional[str]:
+    for line in lines:
+        for pattern in DATE_RES:
+            m = pattern.search(line)
+            if m:
+                date = normalize_date(m.group(0))
+                if date:
+                    return date
+    return None
+
+
+def _find_vendor(lines: List[str]) -> Optional[str]:
+    # The store name is almost always one of the first few non-empty lines
+    for line in lines[:5]:
+        m = VENDOR_RE.search(line)
+        if m and not AMOUNT_RE.search(line) and len(m.group(0).strip()) >= 3:
+            return m.group(0).strip()
+    return None
+
+
+def extract_with_rules(ocr_text: str) -> ParsedReceipt:
+    """Regex/heuristic extraction; confidence reflects how much of the receipt checks out."""
+    lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+    subtotal = tax = None
+    totals: List[float] = []
+    for line in lines:
+        amount = _last_amount(line)
+        if amount is None:
+            continue
+        if SUBTOTAL_RE.search(line):
+            subtotal = amount
+        elif TAX_RE.search(line):
+            tax = amount if tax is None else tax + amount
+        elif TOTAL_RE.search(line):
+            totals.append(amount)
+    # "TOTAL SAVINGS", "TOTAL ITEMS" etc. are smaller than the real grand total
+    total = max(totals) if totals else None
+    date = _find_date(lines)
+    vendor = _find_vendor(lines)
+
+    score = 0.0
+    if total is not None:
+        score += 0.4
+        if tax is not None:
+            score += 0.1
+            if subtotal is not None:
+                if abs(subtotal + tax - total) <= AMOUNT_TOLERANCE:
+                    score += 0.25
+                else:
+                    score -= 0.3
+            elif abs((total - tax) * HST_RATE - tax) <= AMOUNT_TOLERANCE:
+                score += 0.25
+    if date is not None:
+        score += 0.15
+    if vendor is not None:
+        score += 0.1
+    return ParsedReceipt(
+        vendor=vendor,
+        date=date,
+        total_amount=total,
+        tax=tax,
+        confidence=round(max(0.0, min(score, 1.0)), 2),
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .config import Settings
+from .logger import get_logger
+from .models import ParsedReceipt
+from .pipeline import Extractor, Pipeline
+from .rules import extract_with_rules
+
+logger = get_logger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class RuleExtractor:
+    """LLM-free extractor (rules only); used by ``serve --stub-llm`` for local testing."""
+
+    async def parse(self, ocr_text: str) -> ParsedReceipt:
+        return extract_with_rules(ocr_text)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class ExtractionServer:
+    """Minimal asyncio HTTP/1.1 front end over one warm Pipeline.
+
+    POST /extract    image bytes (?filename=receipt.png) or JSON {"path": ...} / {"paths": [...]}
+    GET  /health     liveness and counters
+    GET  /queue      requests in flight vs. the admission limit
+
+    Concurrent requests share the pipeline's OCR pool and Ollama client, so
+    with llm_batch_size > 1 they are batched into shared prompts.
+    """
+
+    def __init__(self, cfg: Settings, pipeline: Optional[Pipeline] = None,
+                 extractor: Optional[Extractor] = None):
+        self.cfg = cfg
+        self.pipeline = pipeline or Pipeline(cfg, extractor=extractor)
+        self.max_pending = cfg.serve_max_pending
+        self.max_body = cfg.serve_max_upload_mb * 1024 * 1024
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self._upload_dir = tempfile.TemporaryDirectory(prefix="receipt-analyzer-")
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int) -> Tuple[str, int]:
+        self.pipeline.start()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        addr = self._server.sockets[0].getsockname()
+        logger.info("Serving on http://%s:%d", addr[0], addr[1])
+        return addr[0], addr[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.pipeline.aclose()
+        self.pipeline.close()
+        self._upload_dir.cleanup()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": "upload too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self._route(method, target, headers, body)
+                except HttpError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+                except Exception as exc:
+                    logger.exception("Request failed: %s", exc)
+                    status, payload = 500, {"error": str(exc)}
+                close = headers.get("connection", "").lower() == "close"
+                await self._respond(writer, status, payload, close=close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Any, close: bool) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"status": "ok", "uptime_seconds": round(time.time() - self.started_at, 1),
+                         "processed": self.processed, "failed": self.failed}
+        if url.path == "/queue":
+            return 200, {"queue_depth": self.pending, "max_pending": self.max_pending}
+        if url.path != "/extract":
+            raise HttpError(404, f"no route for {url.path}")
+        if method != "POST":
+            raise HttpError(405, "use POST")
+        if headers.get("content-type", "").startswith("application/json"):
+            request = json.loads(body or b"{}")
+            paths = request.get("paths") or ([request["path"]] if "path" in request else [])
+            if not paths:
+                raise HttpError(400, "expected 'path' or 'paths'")
+            rows = await asyncio.gather(*(self._extract(Path(p)) for p in paths))
+            return 200, rows if "paths" in request else rows[0]
+        if not body:
+            raise HttpError(400, "empty upload")
+        name = Path(parse_qs(url.query).get("filename", ["upload.png"])[0]).name
+        with tempfile.NamedTemporaryFile(dir=self._upload_dir.name, suffix=Path(name).suffix or ".png") as tmp:
+            tmp.write(body)
+            tmp.flush()
+            row = await self._extract(Path(tmp.name))
+        row["file_name"] = name
+        return 200, row
+
+    async def _extract(self, path: Path) -> Dict[str, Any]:
+        if not path.is_file():
+            raise HttpError(400, f"not a file: {path}")
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "server busy, retry later")
+        self.pending += 1
+        try:
+            row = await self.pipeline.process(path)
+        finally:
+            self.pending -= 1
+        if "error" in row:
+            self.failed += 1
+        else:
+            self.processed += 1
+        row.pop("raw_text", None)
+        return row
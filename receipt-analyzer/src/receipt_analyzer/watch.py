@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .config import Settings
+from .exporter import open_writer, supports_append
+from .logger import get_logger
+from .manifest import Manifest
+from .pipeline import Pipeline
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: fall back to polling the directory
+    Observer = None
+
+logger = get_logger(__name__)
+
+
+class ReceiptWatcher:
+    """Long-running daemon that processes receipts as they land in receipts_dir.
+
+    New files are noticed through inotify (via watchdog) when available, or by
+    polling the directory mtime otherwise. A file is only picked up once its
+    size and mtime have been stable for ``watch_settle_seconds``, so partially
+    copied files are not OCR'd. One Pipeline stays warm for the whole session.
+    Rows go to the manifest immediately and the output is refreshed once
+    arrivals go quiet for ``watch_export_seconds``.
+    """
+
+    def __init__(self, cfg: Settings, manifest: Manifest, suffixes: Set[str],
+                 pipeline: Optional[Pipeline] = None):
+        self.cfg = cfg
+        self.manifest = manifest
+        self.suffixes = suffixes
+        self.receipts_dir = Path(cfg.receipts_dir)
+        self.pipeline = pipeline or Pipeline(cfg)
+        self._candidates: Dict[Path, Tuple[int, int, float]] = {}
+        self._in_flight: Set[Path] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(self.pipeline.llm_consumers)
+        self._new_rows: List[Dict[str, Any]] = []
+        self._replaced = False
+        self._last_row_at = 0.0
+        self._dir_mtime = -1
+        self._stopping = asyncio.Event()
+
+    def _wants(self, path: Path) -> bool:
+        return path.suffix.lower() in self.suffixes and not path.name.startswith(".")
+
+    def notify(self, path: Path) -> None:
+        """Register a possibly new or modified file (called from the inotify thread via the loop)."""
+        if self._wants(path) and path not in self._in_flight:
+            self._candidates.setdefault(path, (-1, -1, 0.0))
+
+    def _scan(self) -> None:
+        mtime = self.receipts_dir.stat().st_mtime_ns
+        if mtime == self._dir_mtime:
+            return
+        self._dir_mtime = mtime
+        with os.scandir(self.receipts_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self.notify(Path(entry.path))
+
+    def _settled(self) -> List[Path]:
+        ready = []
+        now = time.monotonic()
+        for path, (size, mtime, since) in list(self._candidates.items()):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                del self._candidates[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self._candidates[path] = (st.st_size, st.st_mtime_ns, now)
+            elif st.st_size > 0 and now - since >= self.cfg.watch_settle_seconds:
+                del self._candidates[path]
+                if self.manifest.needs_processing(path):
+                    ready.append(path)
+        return ready
+
+    async def _process(self, path: Path) -> None:
+        async with self._slots:
+            try:
+                replaced = self.manifest.lookup(path) is not None
+                row = await self.pipeline.process(path)
+                if "error" not in row:
+                    self.manifest.record(path, row)
+                self._replaced = self._replaced or replaced
+                self._new_rows.append(row)
+                self._last_row_at = time.monotonic()
+                logger.info("Processed %s", path.name)
+            finally:
+                self._in_flight.discard(path)
+
+    def export(self) -> None:
+        output = Path(self.cfg.output_excel)
+        append = supports_append(output) and output.exists() and not self._replaced
+        rows, self._new_rows, self._replaced = self._new_rows, [], False
+        with open_writer(output, self.cfg.export_flush_every, append=append,
+                         partition_by=self.cfg.parquet_partition_by,
+                         row_group_size=self.cfg.parquet_row_group_size) as writer:
+            failed = [r for r in rows if "error" in r]
+            for row in (rows if append else itertools.chain(self.manifest.iter_rows(), failed)):
+                writer.write(row)
+
+    def _start_observer(self, loop: asyncio.AbstractEventLoop):
+        if Observer is None:
+            logger.info("watchdog not installed; polling %s every %.1fs", self.receipts_dir, self.cfg.watch_poll_seconds)
+            return None
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    path = Path(getattr(event, "dest_path", "") or event.src_path)
+                    loop.call_soon_threadsafe(watcher.notify, path)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.receipts_dir), recursive=False)
+        observer.start()
+        logger.info("Watching %s for new receipts", self.receipts_dir)
+        return observer
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def serve_forever(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.pipeline.start()
+        observer = self._start_observer(loop)
+        last_poll = 0.0
+        tick = max(0.05, min(0.25, self.cfg.watch_settle_seconds))
+        try:
+            self._scan()  # catch up on anything that arrived while we were down
+            while not self._stopping.is_set():
+                now = time.monotonic()
+                if observer is None and now - last_poll >= self.cfg.watch_poll_seconds:
+                    self._scan()
+                    last_poll = now
+                for path in self._settled():
+                    self._in_flight.add(path)
+                    task = asyncio.create_task(self._process(path))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if self._new_rows and now - self._last_row_at >= self.cfg.watch_export_seconds:
+                    self.export()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=tick)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            if self._new_rows:
+                self.export()
+            await self.pipeline.aclose()
+            self.pipeline.close()
@@ -0,0 +1,46 @@
+import time
+from unittest.mock import patch
+import numpy as np
+from receipt_analyzer.cache import DiskCache
+from receipt_analyzer.ocr import image_to_text
+from receipt_analyzer.parser import call_ollama
+
+def test_disk_cache_roundtrip_and_eviction(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite", max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"67890")
+    assert cache.get("a") == b"12345"
+    cache.set("c", b"xxxxx")  # over budget, "b" is least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == b"xxxxx"
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+@patch("receipt_analyzer.ocr.run_tesseract", return_value=("TOTAL 12.34", 90.0))
+@patch("receipt_analyzer.ocr.load_gray", return_value=np.full((40, 40), 255, dtype=np.uint8))
+def test_image_to_text_uses_cache(mock_load, mock_ocr, tmp_path):
+    img = tmp_path / "r.png"
+    img.write_bytes(b"fake image bytes")
+    cache = DiskCache(tmp_path / "ocr.sqlite")
+    assert image_to_text(img, cache=cache) == "TOTAL 12.34"
+    assert image_to_text(img, cache=cache) == "TOTAL 12.34"
+    assert mock_ocr.call_count == 1
+
+def test_disk_cache_ttl_expires_entries(tmp_path):
+    cache = DiskCache(tmp_path / "llm.sqlite", ttl=60)
+    cache.set("k", b"v")
+    assert cache.get("k") == b"v"
+    with patch("receipt_analyzer.cache.time.time", return_value=time.time() + 120):
+        assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+@patch("receipt_analyzer.parser.get_client")
+def test_call_ollama_serves_repeat_prompts_from_cache(mock_client, tmp_path):
+    mock_client.return_value.generate.return_value = {"response": '{"vendor": "X"}'}
+    cache = DiskCache(tmp_path / "llm.sqlite")
+    for _ in range(3):
+        assert call_ollama("prompt", model="m", ollama_cmd="ollama", timeout=5, cache=cache) == '{"vendor": "X"}'
+    assert mock_client.return_value.generate.call_count == 1
+    assert call_ollama("prompt", model="other", ollama_cmd="ollama", timeout=5, cache=cache)
+    assert mock_client.return_value.generate.call_count == 2
@@ -0,0 +1,34 @@
+import threading
+import time
+import numpy as np
+from receipt_analyzer.engine import EnginePool
+
+class FakeEngine:
+    created = 0
+
+    def __init__(self):
+        FakeEngine.created += 1
+        self.busy = False
+
+    def recognize(self, img):
+        assert not self.busy, "engine used by two threads at once"
+        self.busy = True
+        time.sleep(0.01)
+        self.busy = False
+        return f"{img.shape[1]}x{img.shape[0]}", 90.0
+
+    def close(self):
+        pass
+
+def test_engine_pool_reuses_bounded_engines():
+    FakeEngine.created = 0
+    pool = EnginePool(2, FakeEngine)
+    img = np.zeros((10, 20), dtype=np.uint8)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.recognize(img))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [("20x10", 90.0)] * 8
+    assert FakeEngine.created == 2
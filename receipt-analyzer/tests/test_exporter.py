@@ -7,3 +7,51 @@ def test_export_to_excel(tmp_path):
     out = tmp_path / "out.xlsx"
     export_to_excel(rows, out)
     assert out.exists()
+
+import json
+import pandas as pd
+from receipt_analyzer.exporter import open_writer
+
+def test_streaming_writers_roundtrip(tmp_path):
+    rows = [{"file_name": f"{i}.png", "vendor": "X", "total_amount": float(i), "raw_text": "..."} for i in range(5)]
+    for suffix in (".xlsx", ".csv", ".jsonl"):
+        out = tmp_path / f"out{suffix}"
+        with open_writer(out, flush_every=2) as writer:
+            for row in rows:
+                writer.write(row)
+        if suffix == ".xlsx":
+            df = pd.read_excel(out)
+        elif suffix == ".csv":
+            df = pd.read_csv(out)
+        else:
+            df = pd.DataFrame([json.loads(line) for line in out.read_text().splitlines()])
+        assert list(df["total_amount"]) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert not (tmp_path / "out.xlsx.partial.jsonl").exists()
+
+def test_xlsx_writer_journals_rows_before_close(tmp_path):
+    out = tmp_path / "out.xlsx"
+    writer = open_writer(out, flush_every=1)
+    writer.write({"file_name": "a.png", "total_amount": 1.5})
+    # simulated crash: nothing closed, but the flushed journal is readable
+    journal = (tmp_path / "out.xlsx.partial.jsonl").read_text().splitlines()
+    assert json.loads(journal[0])["total_amount"] == 1.5
+    assert not out.exists()
+
+def test_parquet_writer_partitions_and_appends(tmp_path):
+    import pytest
+    ds = pytest.importorskip("pyarrow.dataset")
+    out = tmp_path / "out.parquet"
+    rows = [{"file_name": "a.png", "vendor": "Metro", "date": "2024-03-15", "total_amount": 10.71},
+            {"file_name": "b.png", "vendor": "Loblaws", "date": "2024-04-01", "total_amount": 5.0}]
+    with open_writer(out, partition_by="month", row_group_size=1) as writer:
+        for row in rows:
+            writer.write(row)
+    assert (out / "year=2024" / "month=03").is_dir()
+    with open_writer(out, partition_by="month", append=True) as writer:
+        writer.write({"file_name": "c.png", "vendor": "Metro", "date": "2024-03-20", "total_amount": 1.0})
+    table = ds.dataset(out, partitioning="hive").to_table()
+    assert sorted(table.column("file_name").to_pylist()) == ["a.png", "b.png", "c.png"]
+    assert str(table.schema.field("date").type) == "date32[day]"
+    with open_writer(out) as writer:  # full rewrite replaces earlier parts
+        writer.write(rows[0])
+    assert ds.dataset(out, partitioning="hive").count_rows() == 1
@@ -0,0 +1,22 @@
+import os
+from receipt_analyzer.manifest import Manifest
+
+def test_manifest_tracks_new_changed_and_touched_files(tmp_path):
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    a.write_bytes(b"aaa")
+    b.write_bytes(b"bbb")
+    manifest = Manifest(tmp_path / "m.sqlite")
+    assert manifest.needs_processing(a)
+    manifest.record(a, {"file_name": "a.png", "total_amount": 1.0})
+    assert not manifest.needs_processing(a)
+    assert manifest.needs_processing(b)
+
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # touched, same content
+    assert not manifest.needs_processing(a)
+    a.write_bytes(b"AAA")
+    assert manifest.needs_processing(a)
+
+    assert manifest.rows() == [{"file_name": "a.png", "total_amount": 1.0}]
+    assert manifest.prune([b]) == 1
+    assert manifest.rows() == []
@@ -7,3 +7,32 @@ def test_image_to_text(tmp_path):
     # In CI, mock pytesseract.image_to_string instead of relying on Tesseract
     # This test is a placeholder to show intent
     assert True
+
+import cv2
+import numpy as np
+from unittest.mock import patch
+from receipt_analyzer.ocr import estimate_text_height, choose_scale, preprocess_gray
+
+def _synthetic_receipt(font_scale: float) -> np.ndarray:
+    img = np.full((600, 500), 255, dtype=np.uint8)
+    for i, line in enumerate(["STORE 123", "MILK 4.99", "BREAD 2.49", "SUBTOTAL 7.48", "HST 0.97", "TOTAL 8.45"]):
+        cv2.putText(img, line, (20, 60 + i * 80), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, 2)
+    return img
+
+def test_scale_follows_text_height():
+    small, large = _synthetic_receipt(0.5), _synthetic_receipt(1.5)
+    assert estimate_text_height(small) < estimate_text_height(large)
+    assert choose_scale(small, "balanced") > choose_scale(large, "balanced")
+
+def test_profiles_return_binary_image():
+    gray = _synthetic_receipt(1.0)
+    for profile in ("fast", "balanced", "quality"):
+        th = preprocess_gray(gray, profile)
+        assert set(np.unique(th)) <= {0, 255}
+
+@patch("receipt_analyzer.ocr.run_tesseract", side_effect=[("T0TAL", 20.0), ("TOTAL 8.45", 91.0)])
+def test_auto_profile_escalates_on_low_confidence(mock_ocr, tmp_path):
+    p = tmp_path / "r.png"
+    cv2.imwrite(str(p), _synthetic_receipt(1.0))
+    assert image_to_text(p, profile="auto", min_confidence=60.0) == "TOTAL 8.45"
+    assert mock_ocr.call_count == 2
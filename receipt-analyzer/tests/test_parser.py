@@ -9,3 +9,31 @@ def test_parse_receipt_text(mock_call):
     assert parsed.date == "2024-12-01"
     assert parsed.total_amount == 12.34
     assert parsed.tax == 0.99
+
+import asyncio
+import json
+import re
+from receipt_analyzer.parser import AsyncExtractor
+
+def test_async_extractor_batches_concurrent_requests():
+    prompts = []
+
+    async def fake_generate(**kwargs):
+        prompts.append(kwargs["prompt"])
+        assert kwargs["keep_alive"] == "5m"
+        n = len(re.findall(r"### RECEIPT \d+ ###", kwargs["prompt"]))
+        receipts = [{"vendor": f"V{i}", "total_amount": str(i), "confidence": 0.9} for i in range(1, n + 1)]
+        return {"response": json.dumps({"receipts": receipts})}
+
+    async def go():
+        extractor = AsyncExtractor("m", keep_alive="5m", batch_size=3, batch_wait=0.01)
+        extractor._client.generate = fake_generate
+        try:
+            return await asyncio.gather(*(extractor.parse(f"receipt {i}") for i in range(3)))
+        finally:
+            await extractor.aclose()
+
+    parsed = asyncio.run(go())
+    assert len(prompts) == 1
+    assert [p.vendor for p in parsed] == ["V1", "V2", "V3"]
+    assert parsed[2].total_amount == 3.0
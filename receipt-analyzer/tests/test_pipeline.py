@@ -0,0 +1,26 @@
+from pathlib import Path
+from receipt_analyzer.config import Settings
+from receipt_analyzer.models import ParsedReceipt
+from receipt_analyzer.pipeline import Pipeline, OcrResult
+
+def fake_ocr(path, cfg):
+    if path.name == "bad.png":
+        raise RuntimeError("unreadable")
+    return OcrResult(f"TOTAL {path.stem}", None)
+
+class FakeExtractor:
+    async def parse(self, text):
+        return ParsedReceipt(vendor="Store", total_amount=float(text.split()[-1]))
+
+    async def aclose(self):
+        pass
+
+def test_pipeline_runs_every_file(tmp_path):
+    cfg = Settings(ocr_workers=2, llm_workers=2, queue_size=1, ocr_cache_enabled=False)
+    paths = [Path(f"{i}.png") for i in range(10)] + [Path("bad.png")]
+    with Pipeline(cfg, ocr_fn=fake_ocr, extractor=FakeExtractor()) as pipeline:
+        rows = pipeline.run(paths)
+    by_name = {r["file_name"]: r for r in rows}
+    assert len(rows) == 11
+    assert by_name["7.png"]["total_amount"] == 7.0
+    assert by_name["bad.png"]["total_amount"] is None
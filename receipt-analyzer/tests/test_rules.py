@@ -0,0 +1,34 @@
+from unittest.mock import patch
+from receipt_analyzer.parser import parse_receipt_text
+from receipt_analyzer.rules import extract_with_rules
+
+RECEIPT = """METRO GROCERY
+123 Queen St W, Toronto
+2024-03-15 14:02
+MILK 2L          5.49
+BREAD            3.99
+SUBTOTAL         9.48
+HST 13%          1.23
+TOTAL           10.71
+VISA            10.71
+"""
+
+def test_rules_extract_consistent_receipt():
+    parsed = extract_with_rules(RECEIPT)
+    assert parsed.vendor == "METRO GROCERY"
+    assert parsed.date == "2024-03-15"
+    assert parsed.total_amount == 10.71
+    assert parsed.tax == 1.23
+    assert parsed.confidence == 1.0
+
+def test_rules_penalise_inconsistent_totals():
+    parsed = extract_with_rules(RECEIPT.replace("TOTAL           10.71", "TOTAL           17.71"))
+    assert parsed.confidence < 0.9
+
+@patch("receipt_analyzer.parser.call_ollama")
+def test_fast_path_skips_llm_only_when_confident(mock_call):
+    mock_call.return_value = '{"vendor":"LLM","date":"2024-01-01","total_amount":"1.00","tax":"0.10","confidence":0.5}'
+    assert parse_receipt_text(RECEIPT, "m", "ollama", 10, fast_path_threshold=0.9).vendor == "METRO GROCERY"
+    assert mock_call.call_count == 0
+    assert parse_receipt_text("blurry", "m", "ollama", 10, fast_path_threshold=0.9).vendor == "LLM"
+    assert mock_call.call_count == 1
@@ -0,0 +1,40 @@
+import asyncio
+import json
+from receipt_analyzer.config import Settings
+from receipt_analyzer.pipeline import Pipeline
+from receipt_analyzer.server import ExtractionServer
+from test_pipeline import fake_ocr, FakeExtractor
+
+async def _request(port, method, target, body=b"", content_type="application/octet-stream"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: x\r\nContent-Type: {content_type}\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+def test_server_extracts_uploads_and_paths(tmp_path):
+    cfg = Settings(ocr_workers=1, llm_workers=2, ocr_cache_enabled=False)
+    receipt = tmp_path / "7.png"
+    receipt.write_bytes(b"img")
+
+    async def scenario():
+        server = ExtractionServer(cfg, pipeline=Pipeline(cfg, ocr_fn=fake_ocr, extractor=FakeExtractor()))
+        _, port = await server.start("127.0.0.1", 0)
+        try:
+            upload = await _request(port, "POST", "/extract?filename=3.png", b"bytes")
+            by_path = await _request(port, "POST", "/extract", json.dumps({"paths": [str(receipt)]}).encode(),
+                                     "application/json")
+            health = await _request(port, "GET", "/health")
+            missing = await _request(port, "GET", "/nope")
+        finally:
+            await server.close()
+        return upload, by_path, health, missing
+
+    upload, by_path, health, missing = asyncio.run(scenario())
+    assert upload[0] == 200 and upload[1]["file_name"] == "3.png" and upload[1]["vendor"] == "Store"
+    assert by_path[0] == 200 and by_path[1][0]["total_amount"] == 7.0
+    assert health[1]["processed"] == 2
+    assert missing[0] == 404
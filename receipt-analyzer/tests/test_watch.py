@@ -0,0 +1,39 @@
+import asyncio
+import csv
+from pathlib import Path
+from unittest.mock import patch
+from receipt_analyzer.config import Settings
+from receipt_analyzer.manifest import Manifest
+from receipt_analyzer.pipeline import Pipeline
+from receipt_analyzer.watch import ReceiptWatcher
+from test_pipeline import fake_ocr, FakeExtractor
+
+def test_watcher_processes_settled_files(tmp_path):
+    receipts = tmp_path / "in"
+    receipts.mkdir()
+    (receipts / "1.png").write_bytes(b"already here")
+    out = tmp_path / "out.csv"
+    cfg = Settings(receipts_dir=receipts, output_excel=out, ocr_workers=1, llm_workers=1,
+                   ocr_cache_enabled=False, watch_settle_seconds=0.1, watch_poll_seconds=0.05,
+                   watch_export_seconds=0.05)
+    manifest = Manifest(tmp_path / "m.sqlite")
+
+    async def scenario():
+        pipeline = Pipeline(cfg, ocr_fn=fake_ocr, extractor=FakeExtractor())
+        watcher = ReceiptWatcher(cfg, manifest, {".png"}, pipeline=pipeline)
+        task = asyncio.create_task(watcher.serve_forever())
+        await asyncio.sleep(0.2)
+        (receipts / "2.png").write_bytes(b"new arrival")
+        for _ in range(100):
+            await asyncio.sleep(0.05)
+            if out.exists() and len(out.read_text().splitlines()) == 3:
+                break
+        watcher.stop()
+        await task
+
+    with patch("receipt_analyzer.watch.Observer", None):
+        asyncio.run(scenario())
+    with open(out, newline="") as f:
+        rows = {r["file_name"]: r for r in csv.DictReader(f)}
+    assert rows["1.png"]["total_amount"] == "1.0"
+    assert rows["2.png"]["total_amount"] == "2.0"